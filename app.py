@@ -1,5 +1,6 @@
 import streamlit as st
 from PIL import Image
+import base64
 import io
 import pandas as pd
 import re
@@ -200,11 +201,7 @@ def get_current_user(system):
     if not user_id:
         return None
     
-    for customer in system.customers:
-        if customer.customer_id == user_id:
-            return customer
-    
-    return None
+    return system.customers.get(user_id)
 
 def logout_user():
     if 'logged_in' in st.session_state:
@@ -522,9 +519,9 @@ def show_receipt_upload(system):
             st.info(f"Uploading receipt for: {selected_customer.email}")
         else:
             # Customer selection (admin mode)
-            customer_emails = [c.email for c in system.customers]
+            customer_emails = [c.email for c in system.customers.values()]
             selected_email = st.selectbox("Select Customer", customer_emails)
-            selected_customer = next((c for c in system.customers if c.email == selected_email), None)
+            selected_customer = system.get_customer_by_email(selected_email)
         
         st.markdown("#### Scan Barcode")
         
@@ -634,9 +631,9 @@ def show_receipts(system):
             return
             
         # Customer selection (admin mode)
-        customer_emails = [c.email for c in system.customers]
+        customer_emails = [c.email for c in system.customers.values()]
         selected_email = st.selectbox("Select Customer", customer_emails)
-        selected_customer = next((c for c in system.customers if c.email == selected_email), None)
+        selected_customer = system.get_customer_by_email(selected_email)
     
     if selected_customer and selected_customer.customer_id in system.receipts and system.receipts[selected_customer.customer_id]:
         st.markdown(f"### Receipts for {selected_customer.email}")
@@ -722,9 +719,9 @@ def show_recommendations(system):
             return
             
         # Customer selection (admin mode)
-        customer_emails = [c.email for c in system.customers]
+        customer_emails = [c.email for c in system.customers.values()]
         selected_email = st.selectbox("Select Customer", customer_emails)
-        selected_customer = next((c for c in system.customers if c.email == selected_email), None)
+        selected_customer = system.get_customer_by_email(selected_email)
     
     col1, col2 = st.columns([1, 2])
     
@@ -794,7 +791,7 @@ def show_recommendations(system):
                             st.markdown(f"✓ **Contains your favorite:** {', '.join(matching_ingredients)}")
                     
                     # Find store
-                    store = next((s for s in system.stores if any(mi.item_id == item.item_id for mi in s.menu_items)), None)
+                    store = next((s for s in system.stores.values() if any(mi.item_id == item.item_id for mi in s.menu_items)), None)
                     if store:
                         st.write(f"**Available at:** {store.name}")
                         st.button(f"Add to Cart", key=f"add_{item.item_id}")
@@ -843,7 +840,7 @@ def show_store_marketplace(system):
         # Display all available stores
         st.markdown("### Available Stores")
         
-        for store in system.stores:
+        for store in system.stores.values():
             with st.container():
                 st.markdown(f"""
                 <div class='card'>
@@ -896,7 +893,7 @@ def show_store_marketplace(system):
         # Check if a store is selected to display its details
         selected_store_id = st.session_state.get('selected_store')
         if selected_store_id:
-            selected_store = next((s for s in system.stores if s.store_id == selected_store_id), None)
+            selected_store = system.stores.get(selected_store_id)
             if selected_store:
                 st.markdown(f"### {selected_store.name} Menu Items")
                 
@@ -1,16 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Tuple
+from functools import cache
+from typing import Iterable, List, Optional, Tuple
 import hashlib
+import hmac
+import os
 import secrets
-import random
-import base64
+import sys
+
+import numpy as np
+
+_rng = np.random.default_rng()
+
+# Ingredients the simulated OCR can extract, and those with a shorter shelf life
+_SAMPLE_INGREDIENTS = ("beef", "chicken", "lettuce", "tomato", "cheese",
+                       "bread", "milk", "eggs", "rice", "pasta")
+_PERISHABLE = frozenset(("milk", "eggs"))
+
+# Receipt images are stored here, content-addressed by their SHA-256 digest.
+# Defaults to the user's data directory, outside the source tree and the working directory.
+BLOB_DIR = os.path.abspath(os.environ.get("RECEIPT_BLOB_DIR") or os.path.join(
+    os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share"),
+    "food_recommend", "blobs"))
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(BLOB_DIR, f"{digest}.bin")
+
+def _write_blob(digest: str, data: bytes):
+    """Write a blob unless one with the same digest already exists"""
+    path = _blob_path(digest)
+    if os.path.exists(path):
+        return
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    # Write to a temporary name first so readers never see a partial blob
+    tmp_path = f"{path}.{secrets.token_hex(4)}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _read_blob(digest: str) -> Optional[bytes]:
+    """Read a blob, returning None if it is missing or its contents don't match the digest"""
+    try:
+        with open(_blob_path(digest), "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if hashlib.sha256(data).hexdigest() != digest:
+        return None
+    return data
+
+@cache
+def _b64encoder():
+    """Resolve the base64 encoder for images kept inline when the blob store isn't writable"""
+    try:
+        from pybase64 import b64encode_as_string
+        return b64encode_as_string
+    except ImportError:
+        from binascii import b2a_base64
+        return lambda data: b2a_base64(data, newline=False).decode('ascii')
+
+@cache
+def _b64decoder():
+    """Resolve the base64 decoder for inline images in older snapshots on first use"""
+    try:
+        from pybase64 import b64decode
+    except ImportError:
+        # Call the C codec in binascii directly, skipping the base64 module wrapper
+        from binascii import a2b_base64 as b64decode
+    return b64decode
+
+def _as_datetime(value) -> datetime:
+    """Accept datetimes as well as the ISO-8601 strings older snapshots contain"""
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+# Version 1 is the legacy single-round SHA-256 of password+salt; version 2 is PBKDF2
+PASSWORD_HASH_VERSION = 2
+PBKDF2_ITERATIONS = 100_000
+
+def _hash_password(password: str, salt: bytes, version: int) -> str:
+    """Hash a password with the given encoded salt using the given hash version"""
+    password_bytes = password.encode()
+    if version == 1:
+        # UTF-8 encoding distributes over concatenation, so this matches sha256((password + salt).encode())
+        return hashlib.sha256(password_bytes + salt).hexdigest()
+    return hashlib.pbkdf2_hmac('sha256', password_bytes, salt, PBKDF2_ITERATIONS).hex()
+
+def _reject_password(password: str) -> bool:
+    """Hash against a throwaway salt so a rejection takes as long as a real check"""
+    _hash_password(password, secrets.token_bytes(32), PASSWORD_HASH_VERSION)
+    return False
 
 class Customer:
+    __slots__ = ("customer_id", "_email", "_email_lower", "birthdate", "gender", "address", "favorite_food",
+                 "purchase_history", "password_hash", "_salt", "_salt_bytes", "last_login",
+                 "password_hash_version")
+    
     def __init__(self, customer_id: str, email: str, birthdate: datetime, gender: str, 
                  address: str, favorite_food: List[str] = None, password_hash: str = None, 
-                 salt: str = None, last_login: datetime = None):
+                 salt: str = None, last_login: datetime = None, password_hash_version: int = 1):
         self.customer_id = customer_id
-        self.email = email
+        self._set_email(email)
         self.birthdate = birthdate
         self.gender = gender
         self.address = address
@@ -19,21 +113,59 @@ class Customer:
         self.password_hash = password_hash
         self.salt = salt
         self.last_login = last_login
+        self.password_hash_version = password_hash_version
+    
+    @property
+    def email(self) -> str:
+        # Read-only: ReceiptSystem indexes customers by email, so changes go
+        # through ReceiptSystem.update_customer_email
+        return self._email
+    
+    def _set_email(self, email: str):
+        self._email = email
+        self._email_lower = email.lower()  # Key into ReceiptSystem's email index
+    
+    @property
+    def salt(self) -> str:
+        return self._salt
+    
+    @salt.setter
+    def salt(self, salt: str):
+        # Keep the encoded salt alongside the hex string so hashing doesn't re-encode it
+        self._salt = salt
+        self._salt_bytes = salt.encode() if salt else None
     
     def set_password(self, password: str):
         """Set a new password with salt and hashing"""
         self.salt = secrets.token_hex(16)
-        self.password_hash = self._hash_password(password, self.salt)
+        self.password_hash_version = PASSWORD_HASH_VERSION
+        self.password_hash = self._hash_password(password, self._salt_bytes)
     
     def verify_password(self, password: str) -> bool:
         """Verify if the provided password matches the stored hash"""
-        if not self.password_hash or not self.salt:
+        if not self._check_password(password):
             return False
-        return self.password_hash == self._hash_password(password, self.salt)
+        self._upgrade_password_hash(password)
+        return True
+    
+    def _check_password(self, password: str) -> bool:
+        """Compare a password against the stored hash without modifying the customer"""
+        if not self.password_hash or not self.salt:
+            return _reject_password(password)
+        if self.password_hash_version < PASSWORD_HASH_VERSION:
+            # Legacy hashes are a single SHA-256; pay the PBKDF2 cost as well so
+            # these accounts take as long to check as current ones and unknown emails
+            _reject_password(password)
+        return hmac.compare_digest(self.password_hash, self._hash_password(password, self._salt_bytes))
     
-    def _hash_password(self, password: str, salt: str) -> str:
-        """Hash a password with the given salt"""
-        return hashlib.sha256((password + salt).encode()).hexdigest()
+    def _upgrade_password_hash(self, password: str):
+        """Rehash a verified password if it is stored with a legacy hash version"""
+        if self.password_hash_version < PASSWORD_HASH_VERSION:
+            self.set_password(password)
+    
+    def _hash_password(self, password: str, salt: bytes) -> str:
+        """Hash a password with the given encoded salt using the customer's hash version"""
+        return _hash_password(password, salt, self.password_hash_version)
     
     def record_login(self):
         """Record the current datetime as the last login time"""
@@ -43,73 +175,144 @@ class Customer:
         return {
             "customer_id": self.customer_id,
             "email": self.email,
-            "birthdate": self.birthdate.isoformat(),
+            "birthdate": self.birthdate,
             "gender": self.gender,
             "address": self.address,
             "favorite_food": self.favorite_food,
             "password_hash": self.password_hash,
             "salt": self.salt,
-            "last_login": self.last_login.isoformat() if self.last_login else None
+            "password_hash_version": self.password_hash_version,
+            "last_login": self.last_login
         }
     
     @classmethod
     def from_dict(cls, data):
+        last_login = data.get("last_login")
         return cls(
             customer_id=data["customer_id"],
             email=data["email"],
-            birthdate=datetime.fromisoformat(data["birthdate"]),
+            birthdate=_as_datetime(data["birthdate"]),
             gender=data["gender"],
             address=data["address"],
-            favorite_food=data["favorite_food"],
+            favorite_food=[sys.intern(food) for food in data["favorite_food"]],
             password_hash=data.get("password_hash"),
             salt=data.get("salt"),
-            last_login=datetime.fromisoformat(data["last_login"]) if data.get("last_login") else None
+            password_hash_version=data.get("password_hash_version", 1),
+            last_login=_as_datetime(last_login) if last_login else None
         )
 
 class Receipt:
+    __slots__ = ("receipt_id", "upload_date", "_image_data", "_blob_saved", "image_ref",
+                 "ocr_text", "_ingredients", "_ing_set", "quantity", "shelf_life")
+    
     def __init__(self, receipt_id: str, upload_date: datetime, image_data: bytes, 
-                 ocr_text: str, ingredients: List[str], quantity: int, shelf_life: datetime):
+                 ocr_text: str, ingredients: List[str], quantity: int, shelf_life: datetime,
+                 image_ref: str = None):
         self.receipt_id = receipt_id
         self.upload_date = upload_date
         self.image_data = image_data
+        if image_ref is not None:
+            self.image_ref = image_ref
         self.ocr_text = ocr_text
         self.ingredients = ingredients
         self.quantity = quantity
         self.shelf_life = shelf_life
     
+    @property
+    def image_data(self) -> bytes:
+        # Images referenced from a snapshot are only read from the blob store when needed;
+        # a missing or corrupt blob reads as no image
+        if self._image_data is None and self.image_ref:
+            image_data = _read_blob(self.image_ref)
+            if image_data is not None:
+                self._image_data = image_data
+                self._blob_saved = True
+        return self._image_data
+    
+    @image_data.setter
+    def image_data(self, image_data: bytes):
+        # The digest is only computed once the image is saved to the blob store
+        self._image_data = image_data
+        self._blob_saved = False
+        self.image_ref = None
+    
+    @property
+    def ingredients(self) -> List[str]:
+        # Hand out a copy so assigning through the setter is the only way to change
+        # ingredients, keeping the frozenset used for O(1) membership tests in sync
+        return list(self._ingredients)
+    
+    @ingredients.setter
+    def ingredients(self, ingredients: Iterable[str]):
+        self._ingredients = tuple(ingredients)
+        self._ing_set = frozenset(self._ingredients)
+    
     def to_dict(self):
+        image_ref = self._save_image()
         return {
             "receipt_id": self.receipt_id,
-            "upload_date": self.upload_date.isoformat(),
-            "image_data": base64.b64encode(self.image_data).decode('utf-8') if self.image_data else None,
+            "upload_date": self.upload_date,
+            "image_ref": image_ref,
+            # Kept inline, as in older snapshots, only if the blob store couldn't be written
+            "image_data": _b64encoder()(self._image_data) if image_ref is None and self._image_data else None,
             "ocr_text": self.ocr_text,
             "ingredients": self.ingredients,
             "quantity": self.quantity,
-            "shelf_life": self.shelf_life.isoformat()
+            "shelf_life": self.shelf_life
         }
     
+    def _save_image(self) -> Optional[str]:
+        """
+        Write the image to the blob store if needed and return its reference,
+        or None if there is no image or the blob store can't be written
+        """
+        if self._image_data and not self._blob_saved:
+            digest = hashlib.sha256(self._image_data).hexdigest()
+            try:
+                _write_blob(digest, self._image_data)
+            except OSError:
+                return None
+            self.image_ref = digest
+            self._blob_saved = True
+        return self.image_ref
+    
     @classmethod
     def from_dict(cls, data):
-        image_data = base64.b64decode(data["image_data"]) if data.get("image_data") else None
+        # Snapshots written before the blob store embed the image as base64
+        image_data = data.get("image_data")
         return cls(
             receipt_id=data["receipt_id"],
-            upload_date=datetime.fromisoformat(data["upload_date"]),
-            image_data=image_data,
+            upload_date=_as_datetime(data["upload_date"]),
+            image_data=_b64decoder()(image_data) if image_data else None,
             ocr_text=data["ocr_text"],
-            ingredients=data["ingredients"],
+            ingredients=[sys.intern(ingredient) for ingredient in data["ingredients"]],
             quantity=data["quantity"],
-            shelf_life=datetime.fromisoformat(data["shelf_life"])
+            shelf_life=_as_datetime(data["shelf_life"]),
+            image_ref=data.get("image_ref")
         )
 
 class MenuItem:
+    __slots__ = ("item_id", "name", "_ingredients", "_ing_set", "price")
+    
     def __init__(self, item_id: str, name: str, ingredients: List[str], price: float):
         self.item_id = item_id
         self.name = name
         self.ingredients = ingredients
         self.price = price
     
-    def match_ingredients(self, ingredients: List[str]) -> bool:
-        return any(ingredient in self.ingredients for ingredient in ingredients)
+    @property
+    def ingredients(self) -> List[str]:
+        # Hand out a copy so assigning through the setter is the only way to change
+        # ingredients, keeping the frozenset used for O(1) membership tests in sync
+        return list(self._ingredients)
+    
+    @ingredients.setter
+    def ingredients(self, ingredients: Iterable[str]):
+        self._ingredients = tuple(ingredients)
+        self._ing_set = frozenset(self._ingredients)
+    
+    def match_ingredients(self, ingredients: Iterable[str]) -> bool:
+        return not self._ing_set.isdisjoint(ingredients)
     
     def to_dict(self):
         return {
@@ -124,11 +327,13 @@ class MenuItem:
         return cls(
             item_id=data["item_id"],
             name=data["name"],
-            ingredients=data["ingredients"],
+            ingredients=[sys.intern(ingredient) for ingredient in data["ingredients"]],
             price=data["price"]
         )
 
 class Store:
+    __slots__ = ("store_id", "name", "location", "menu_items")
+    
     def __init__(self, store_id: str, name: str, location: Tuple, menu_items: List[MenuItem]):
         self.store_id = store_id
         self.name = name
@@ -158,28 +363,57 @@ class Store:
 
 class ReceiptSystem:
     def __init__(self):
-        self.customers = []
-        self.stores = []
+        self.customers = {}  # Map customer_id to customer
+        self._by_email = {}  # Map lowercased email to customer
+        self.stores = {}  # Map store_id to store
         self.receipts = {}  # Map customer_id to list of receipts
+        self._all_menu_items = []  # Menu items of every store, in store order
+        self._item_ing = None  # Menu item x ingredient matrix, built lazily
         
     def register_customer(self, customer: Customer):
         """Register a new customer in the system"""
         # Check if customer already exists
-        if any(c.customer_id == customer.customer_id for c in self.customers):
+        if customer.customer_id in self.customers:
             raise ValueError(f"Customer with ID {customer.customer_id} already exists")
         
-        if any(c.email == customer.email for c in self.customers):
+        if customer._email_lower in self._by_email:
             raise ValueError(f"Customer with email {customer.email} already exists")
             
-        self.customers.append(customer)
+        self.customers[customer.customer_id] = customer
+        self._by_email[customer._email_lower] = customer
         self.receipts[customer.customer_id] = []
         
     def add_store(self, store: Store):
-        """Add a new store to the system"""
-        if any(s.store_id == store.store_id for s in self.stores):
+        """
+        Add a new store to the system. The store's menu is treated as immutable
+        once added; call refresh_menus after changing it in place.
+        """
+        if store.store_id in self.stores:
             raise ValueError(f"Store with ID {store.store_id} already exists")
             
-        self.stores.append(store)
+        self.stores[store.store_id] = store
+        self._all_menu_items.extend(store.menu_items)
+        self._item_ing = None
+    
+    def refresh_menus(self):
+        """Pick up menu items or ingredients changed after their store was added"""
+        self._all_menu_items = [item for store in self.stores.values() for item in store.menu_items]
+        self._item_ing = None
+    
+    def _build_ingredient_index(self):
+        """Build the menu item x ingredient incidence matrix used for scoring"""
+        ingredient_to_id = {}
+        rows, cols = [], []
+        for row, item in enumerate(self._all_menu_items):
+            for ingredient in item._ing_set:
+                rows.append(row)
+                cols.append(ingredient_to_id.setdefault(ingredient, len(ingredient_to_id)))
+        
+        item_ing = np.zeros((len(self._all_menu_items), len(ingredient_to_id)), dtype=np.uint8)
+        item_ing[rows, cols] = 1
+        
+        self._ingredient_to_id = ingredient_to_id
+        self._item_ing = item_ing
     
     def process_receipt(self, receipt: Receipt, customer_id=None):
         """
@@ -188,24 +422,22 @@ class ReceiptSystem:
         """
         # Simulate OCR and ingredient extraction
         # In a real system, this would use actual OCR and NLP
-        sample_ingredients = ["beef", "chicken", "lettuce", "tomato", 
-                              "cheese", "bread", "milk", "eggs", "rice", "pasta"]
-        
-        # Randomly select 2-5 ingredients from the sample list
-        num_ingredients = random.randint(2, 5)
-        receipt.ingredients = random.sample(sample_ingredients, num_ingredients)
+        # Randomly select 2-5 ingredients from the sample list, drawing their prices in the same pass
+        num_ingredients = int(_rng.integers(2, 6))
+        indices = _rng.choice(len(_SAMPLE_INGREDIENTS), size=num_ingredients, replace=False)
+        prices = _rng.uniform(1.99, 15.99, size=num_ingredients)
+        receipt.ingredients = [_SAMPLE_INGREDIENTS[i] for i in indices]
         
         # Generate some fake OCR text
-        receipt.ocr_text = f"Receipt #{receipt.receipt_id}\n"
-        receipt.ocr_text += f"Date: {receipt.upload_date.strftime('%Y-%m-%d')}\n"
-        receipt.ocr_text += "Items:\n"
-        for ingredient in receipt.ingredients:
-            receipt.ocr_text += f"- {ingredient.capitalize()} ${random.uniform(1.99, 15.99):.2f}\n"
+        parts = [f"Receipt #{receipt.receipt_id}", f"Date: {receipt.upload_date:%Y-%m-%d}", "Items:"]
+        parts.extend(f"- {ingredient.capitalize()} ${price:.2f}" for ingredient, price in zip(receipt.ingredients, prices))
+        parts.append("")  # Keep the trailing newline
+        receipt.ocr_text = "\n".join(parts)
         
         # Calculate shelf life based on ingredients (simplified)
         # In a real system, this would use a more sophisticated algorithm
         shelf_life_days = 7  # Default shelf life is 7 days
-        if "milk" in receipt.ingredients or "eggs" in receipt.ingredients:
+        if not _PERISHABLE.isdisjoint(receipt._ing_set):
             shelf_life_days = 3  # Dairy products have shorter shelf life
         
         receipt.shelf_life = receipt.upload_date + timedelta(days=shelf_life_days)
@@ -219,39 +451,47 @@ class ReceiptSystem:
         Generate personalized recommendations for a customer based on
         their purchase history, preferences, and item shelf life
         """
-        all_menu_items = []
-        for store in self.stores:
-            all_menu_items.extend(store.menu_items)
-            
+        all_menu_items = self._all_menu_items
         if not all_menu_items:
             return []
         
+        if self._item_ing is None:
+            self._build_ingredient_index()
+        
         # Get customer's receipts and extract all ingredients
         customer_ingredients = set(customer.favorite_food)
         if customer.customer_id in self.receipts:
             for receipt in self.receipts[customer.customer_id]:
-                customer_ingredients.update(receipt.ingredients)
+                customer_ingredients.update(receipt._ing_set)
         
-        # Find menu items that match the customer's ingredients
-        matching_items = []
-        for item in all_menu_items:
-            if any(ingredient in item.ingredients for ingredient in customer_ingredients):
-                matching_items.append(item)
+        # Score every menu item by the number of the customer's ingredients it contains
+        ingredient_to_id = self._ingredient_to_id
+        customer_vector = np.zeros(len(ingredient_to_id), dtype=np.int32)
+        customer_vector[[ingredient_to_id[ing] for ing in customer_ingredients if ing in ingredient_to_id]] = 1
+        scores = self._item_ing @ customer_vector
         
-        if matching_items:
-            # Return up to 3 matching items, prioritizing those with more matching ingredients
-            matching_items.sort(key=lambda x: sum(1 for ing in customer_ingredients if ing in x.ingredients), reverse=True)
-            return matching_items[:3]
+        if scores.max() > 0:
+            # Return up to 3 matching items, prioritizing those with more matching ingredients.
+            # Only items scoring at least the third-highest score need sorting; a stable
+            # sort of those keeps earlier menu items first on ties.
+            k = min(3, len(scores))
+            threshold = max(np.partition(scores, -k)[-k], 1)
+            candidates = np.flatnonzero(scores >= threshold)
+            top = candidates[np.argsort(-scores[candidates], kind='stable')[:3]]
+            return [all_menu_items[i] for i in top]
         else:
             # If no matches found, return random items
-            num_recommendations = min(len(all_menu_items), random.randint(1, 3))
-            return random.sample(all_menu_items, num_recommendations)
+            num_recommendations = min(len(all_menu_items), int(_rng.integers(1, 4)))
+            indices = _rng.choice(len(all_menu_items), size=num_recommendations, replace=False)
+            return [all_menu_items[i] for i in indices]
     
     # Add authentication methods
     def authenticate_customer(self, email: str, password: str) -> Customer:
         """Authenticate a customer by email and password"""
         customer = self.get_customer_by_email(email)
         if not customer:
+            # Hash anyway so unknown emails take as long to reject as wrong passwords
+            _reject_password(password)
             return None
         
         if customer.verify_password(password):
@@ -259,25 +499,76 @@ class ReceiptSystem:
             return customer
         return None
     
+    def verify_many(self, pairs: List[Tuple[str, str]]) -> List[Optional[Customer]]:
+        """
+        Verify many (email, password) pairs at once, returning the matching
+        customer or None for each pair. Login times are not recorded.
+        """
+        customers = [self.get_customer_by_email(email) for email, _ in pairs]
+        passwords = [password for _, password in pairs]
+        
+        def check(customer, password):
+            if customer is None:
+                # Hash anyway so unknown emails take as long to reject as wrong passwords
+                return _reject_password(password)
+            return customer._check_password(password)
+        
+        if len(pairs) < 2:
+            verified = list(map(check, customers, passwords))
+        else:
+            # hashlib releases the GIL while hashing, so threads check passwords in parallel
+            with ThreadPoolExecutor(max_workers=min(len(pairs), os.cpu_count() or 1)) as executor:
+                verified = list(executor.map(check, customers, passwords))
+        
+        results = []
+        for customer, password, ok in zip(customers, passwords, verified):
+            if ok:
+                # Upgrade sequentially so concurrent rehashes can't interleave salt and hash
+                customer._upgrade_password_hash(password)
+                results.append(customer)
+            else:
+                results.append(None)
+        return results
+    
     def get_customer_by_email(self, email: str) -> Customer:
         """Get a customer by their email address"""
-        for customer in self.customers:
-            if customer.email.lower() == email.lower():
-                return customer
-        return None
+        return self._by_email.get(email.lower())
     
     def update_customer(self, customer: Customer) -> bool:
         """Update an existing customer in the system"""
-        for i, c in enumerate(self.customers):
-            if c.customer_id == customer.customer_id:
-                self.customers[i] = customer
-                return True
-        return False
+        existing = self.customers.get(customer.customer_id)
+        if existing is None:
+            return False
+        self._check_email_available(customer._email_lower, customer)
+        
+        self._by_email.pop(existing._email_lower, None)
+        self.customers[customer.customer_id] = customer
+        self._by_email[customer._email_lower] = customer
+        return True
+    
+    def update_customer_email(self, customer_id: str, email: str) -> bool:
+        """Change a registered customer's email, keeping the email index in sync"""
+        customer = self.customers.get(customer_id)
+        if customer is None:
+            return False
+        self._check_email_available(email.lower(), customer)
+        
+        # Only touch the customer once the new email is known to be free
+        self._by_email.pop(customer._email_lower, None)
+        customer._set_email(email)
+        self._by_email[customer._email_lower] = customer
+        return True
+    
+    def _check_email_available(self, email_key: str, customer: Customer):
+        """Raise if the email is registered to a customer other than the given one"""
+        owner = self._by_email.get(email_key)
+        if owner is not None and owner.customer_id != customer.customer_id:
+            raise ValueError(f"Customer with email {owner.email} already exists")
     
     def to_dict(self):
         return {
-            "customers": [c.to_dict() for c in self.customers],
-            "stores": [s.to_dict() for s in self.stores],
+            "customers": [c.to_dict() for c in self.customers.values()],
+            "stores": [s.to_dict() for s in self.stores.values()],
             "receipts": {
                 customer_id: [r.to_dict() for r in receipts] 
                 for customer_id, receipts in self.receipts.items()
@@ -289,17 +580,23 @@ class ReceiptSystem:
         system = cls()
         
         # Load stores first
-        for store_data in data.get("stores", []):
-            store = Store.from_dict(store_data)
-            system.stores.append(store)
+        stores = map(Store.from_dict, data.get("stores", []))
+        system.stores = {store.store_id: store for store in stores}
+        system._all_menu_items = [item for store in system.stores.values() for item in store.menu_items]
         
         # Load customers
-        for customer_data in data.get("customers", []):
-            customer = Customer.from_dict(customer_data)
-            system.customers.append(customer)
+        customers = list(map(Customer.from_dict, data.get("customers", [])))
+        system.customers = {customer.customer_id: customer for customer in customers}
+        # Older snapshots could hold emails differing only in case; lookups used to
+        # return the first of those, so keep the first one in the index
+        for customer in customers:
+            system._by_email.setdefault(customer._email_lower, customer)
         
         # Load receipts
-        for customer_id, receipts_data in data.get("receipts", {}).items():
-            system.receipts[customer_id] = [Receipt.from_dict(r) for r in receipts_data]
+        receipt_from_dict = Receipt.from_dict
+        system.receipts = {
+            customer_id: list(map(receipt_from_dict, receipts_data))
+            for customer_id, receipts_data in data.get("receipts", {}).items()
+        }
         
         return system
\ No newline at end of file
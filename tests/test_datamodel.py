@@ -0,0 +1,159 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+import pytest
+
+from src import datamodel
+from src.datamodel import (
+    PASSWORD_HASH_VERSION,
+    Customer,
+    MenuItem,
+    Receipt,
+    ReceiptSystem,
+    Store,
+)
+
+
+@pytest.fixture(autouse=True)
+def blob_dir(tmp_path, monkeypatch):
+    path = tmp_path / "blobs"
+    monkeypatch.setattr(datamodel, "BLOB_DIR", str(path))
+    return path
+
+
+def legacy_snapshot():
+    """A snapshot as written before PBKDF2 hashes, the blob store and native datetimes"""
+    salt = "ab" * 16
+    return {
+        "customers": [{
+            "customer_id": "C1",
+            "email": "legacy@example.com",
+            "birthdate": "1990-01-01T00:00:00",
+            "gender": "Other",
+            "address": "123 Main St",
+            "favorite_food": ["cheese"],
+            "password_hash": hashlib.sha256(("password123" + salt).encode()).hexdigest(),
+            "salt": salt,
+            "last_login": "2024-05-01T12:30:00",
+        }],
+        "stores": [{
+            "store_id": "S1",
+            "name": "Downtown Deli",
+            "location": [40.7128, -74.0060],
+            "menu_items": [
+                {"item_id": "M1", "name": "Pizza", "ingredients": ["dough", "cheese"], "price": 12.99},
+            ],
+        }],
+        "receipts": {
+            "C1": [{
+                "receipt_id": "R1",
+                "upload_date": "2024-05-01T12:00:00",
+                "image_data": base64.b64encode(b"receipt image").decode("utf-8"),
+                "ocr_text": "Receipt #R1\n",
+                "ingredients": ["milk", "eggs"],
+                "quantity": 1,
+                "shelf_life": "2024-05-04T12:00:00",
+            }],
+        },
+    }
+
+
+def sample_system():
+    system = ReceiptSystem()
+    system.add_store(Store("S1", "Downtown Deli", (40.7128, -74.0060), [
+        MenuItem("M1", "Burger", ["beef", "lettuce", "tomato"], 9.99),
+        MenuItem("M2", "Pizza", ["dough", "cheese", "tomato"], 12.99),
+    ]))
+    customer = Customer("C1", "sample@example.com", datetime(1990, 1, 1), "Other",
+                        "123 Main St", favorite_food=["cheese"])
+    customer.set_password("password123")
+    system.register_customer(customer)
+    receipt = Receipt("R1", datetime(2024, 5, 1), b"receipt image", "", [], 1, datetime(2024, 5, 1))
+    system.process_receipt(receipt, customer.customer_id)
+    return system
+
+
+def test_legacy_snapshot_loads():
+    system = ReceiptSystem.from_dict(legacy_snapshot())
+
+    customer = system.get_customer_by_email("LEGACY@example.com")
+    assert customer.birthdate == datetime(1990, 1, 1)
+    assert customer.last_login == datetime(2024, 5, 1, 12, 30)
+    assert customer.password_hash_version == 1
+
+    receipt = system.receipts["C1"][0]
+    assert receipt.image_data == b"receipt image"
+    assert receipt.upload_date == datetime(2024, 5, 1, 12)
+    assert receipt.ingredients == ["milk", "eggs"]
+
+
+def test_legacy_password_verifies_and_upgrades():
+    system = ReceiptSystem.from_dict(legacy_snapshot())
+
+    assert system.authenticate_customer("legacy@example.com", "wrong") is None
+    customer = system.authenticate_customer("legacy@example.com", "password123")
+    assert customer is not None
+    assert customer.password_hash_version == PASSWORD_HASH_VERSION
+
+    reloaded = ReceiptSystem.from_dict(system.to_dict())
+    assert reloaded.authenticate_customer("legacy@example.com", "password123") is not None
+
+
+def test_round_trip(blob_dir):
+    system = sample_system()
+    data = system.to_dict()
+
+    assert data["receipts"]["C1"][0]["image_data"] is None
+    assert len(list(blob_dir.iterdir())) == 1
+
+    reloaded = ReceiptSystem.from_dict(data)
+    assert reloaded.to_dict() == data
+    assert reloaded.receipts["C1"][0].image_data == b"receipt image"
+    assert reloaded.authenticate_customer("sample@example.com", "password123") is not None
+
+
+def test_round_trip_through_json():
+    data = sample_system().to_dict()
+    # Snapshots hold datetimes; a JSON writer has to encode them itself
+    raw = json.dumps(data, default=datetime.isoformat)
+
+    assert ReceiptSystem.from_dict(json.loads(raw)).to_dict() == data
+
+
+def test_unwritable_blob_store_keeps_image_inline(tmp_path, monkeypatch):
+    not_a_dir = tmp_path / "file"
+    not_a_dir.write_bytes(b"")
+    monkeypatch.setattr(datamodel, "BLOB_DIR", str(not_a_dir / "blobs"))
+
+    receipt_data = sample_system().to_dict()["receipts"]["C1"][0]
+    assert receipt_data["image_ref"] is None
+    assert Receipt.from_dict(receipt_data).image_data == b"receipt image"
+
+
+def test_missing_blob_reads_as_no_image(blob_dir):
+    receipt_data = sample_system().to_dict()["receipts"]["C1"][0]
+    for blob in blob_dir.iterdir():
+        blob.unlink()
+
+    assert Receipt.from_dict(receipt_data).image_data is None
+
+
+def test_verify_many():
+    system = ReceiptSystem.from_dict(legacy_snapshot())
+    customer = Customer("C2", "new@example.com", datetime(1990, 1, 1), "Other", "1 High St")
+    customer.set_password("secret-pw")
+    system.register_customer(customer)
+
+    results = system.verify_many([
+        ("new@example.com", "secret-pw"),
+        ("NEW@example.com", "wrong"),
+        ("nobody@example.com", "secret-pw"),
+        ("legacy@example.com", "password123"),
+    ])
+
+    assert [c.customer_id if c else None for c in results] == ["C2", None, None, "C1"]
+    assert system.customers["C1"].password_hash_version == PASSWORD_HASH_VERSION
+    assert system.verify_many([]) == []
+    assert system.verify_many([("new@example.com", "secret-pw")]) == [customer]